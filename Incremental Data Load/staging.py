@@ -11,225 +11,384 @@
 **************************************************************
 """
 
+import csv
+import os
+import sys
 import pymysql
-from pymysql import Error  
+from pymysql import Error
 import pymysql.cursors as cursor
 import logging
+import threading
+from pymysqlpool.pool import Pool
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+# Connection settings, read from the environment once at import
+# so credentials stay out of the source and deployments can point
+# the pipeline elsewhere without editing code.
+_CONN_KW = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASS"),
+    "db": os.getenv("DB_NAME", "Madhan"),
+    "port": int(os.getenv("DB_PORT", "3306")),
+    "charset": "utf8mb4",
+    "autocommit": False,
+    "cursorclass": pymysql.cursors.Cursor,
+}
+
+# Set to True to log table previews after each load step
+DEBUG = False
 
 # Configure logging
 logging.basicConfig(
-    level=logging.INFO,
+    level=logging.DEBUG if DEBUG else logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------#
+#   SQL statements, built once at import so every run reuses
+#   the same string (statement-cache friendly, no per-call
+#   allocation). Values that vary are bound as parameters.
+# -------------------------------------------------------------#
+_SQL_TRUNCATE_STG = "truncate table stg_jun25;"
+
+_SQL_STAGING_INSERT = """
+    INSERT INTO stg_jun25 (col1_id, col2_desc, col3_desc)
+    SELECT col1_id, col2_desc, col3_desc FROM src_jun25;
+"""
+
+# Idempotent under the unique index on table_name: the first run
+# seeds the checkpoint row, reruns leave the existing watermarks
+# alone (the no-op update) instead of failing with ER_DUP_ENTRY
+# and rolling back the whole single-transaction pipeline.
+_SQL_CONTROL_INSERT = """
+    INSERT INTO control_table (table_name, max_created_date, max_modified_date)
+    VALUES ('tgt_jun25', CURRENT_TIMESTAMP(), CURRENT_TIMESTAMP())
+    ON DUPLICATE KEY UPDATE table_name = table_name;
+"""
+
+# Both MAX() values come from one scan (an index seek with
+# idx_stg_dates / idx_src_dates in place) captured into user
+# variables, instead of two correlated subqueries in the UPDATE.
+_SQL_STG_MAX_DATES = """
+    SELECT MAX(created_date), MAX(modified_date)
+    INTO @max_created, @max_modified
+    FROM stg_jun25;
+"""
+
+_SQL_TGT_MAX_DATES = """
+    SELECT MAX(created_date), MAX(modified_date)
+    INTO @max_created, @max_modified
+    FROM tgt_jun25;
+"""
+
+_SQL_CONTROL_UPDATE_FROM_VARS = """
+    UPDATE control_table
+    SET
+        max_created_date = @max_created,
+        max_modified_date = @max_modified
+    WHERE table_name = 'tgt_jun25';
+"""
+
+_SQL_SRC_SIMULATED_UPDATE = """
+    UPDATE src_jun25
+    SET col2_desc = %s, col3_desc = %s
+    WHERE col1_id = %s;
+"""
+
+# Cheap existence probe run before the delta insert: LIMIT 1
+# stops at the first qualifying source row, so a quiet period
+# costs one index lookup instead of a full INSERT ... SELECT.
+_SQL_DELTA_EXISTS = """
+    SELECT EXISTS(
+        SELECT 1
+        FROM src_jun25 s
+        JOIN control_table c
+          ON c.table_name = 'tgt_jun25'
+        WHERE s.created_date > c.max_created_date
+           OR s.modified_date > c.max_modified_date
+        LIMIT 1
+    );
+"""
+
+_SQL_STG_HAS_ROWS = "SELECT EXISTS(SELECT 1 FROM stg_jun25 LIMIT 1);"
+
+_SQL_STG_DELTA_INSERT = """
+    INSERT INTO stg_jun25 (col1_id, col2_desc, col3_desc)
+    SELECT s.col1_id, s.col2_desc, s.col3_desc
+    FROM src_jun25 s
+    JOIN control_table c
+      ON c.table_name = 'tgt_jun25'
+    WHERE s.created_date > c.max_created_date
+       OR s.modified_date > c.max_modified_date;
+"""
+
+_SQL_TGT_INSERT_NEW = """
+    INSERT INTO tgt_jun25 (col1_id, col2_desc, col3_desc)
+    SELECT s.col1_id, s.col2_desc, s.col3_desc
+    FROM stg_jun25 s
+    LEFT JOIN tgt_jun25 t
+      ON t.col1_id = s.col1_id
+    WHERE t.col1_id IS NULL;
+"""
+
+# NULL-safe change filter: <=> treats NULL = NULL as equal, so
+# transitions to or from NULL still count as changes instead of
+# comparing as NULL and being silently skipped.
+_SQL_TGT_UPDATE_CHANGED = """
+    UPDATE tgt_jun25 t
+    JOIN stg_jun25 s
+      ON t.col1_id = s.col1_id
+    SET
+        t.col2_desc = s.col2_desc,
+        t.col3_desc = s.col3_desc
+    WHERE NOT (t.col2_desc <=> s.col2_desc)
+       OR NOT (t.col3_desc <=> s.col3_desc);
+"""
+
+# Preview a table without pulling every row into memory
+def preview_table(cursor_obj, table_name):
+    """
+    Logs the row count of a table and, at DEBUG level, a small
+    preview (first 50 rows) instead of the full table contents.
+    The isEnabledFor gate keeps the preview free on the normal
+    INFO-level path.
+    """
+    cursor_obj.execute(f"SELECT COUNT(*) FROM {table_name};")
+    row_count = cursor_obj.fetchone()[0]
+    logger.info("%s rowcount=%d", table_name, row_count)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Preview of %s:", table_name)
+        # unbuffered server-side cursor: rows stream one at a time
+        # instead of the whole result set landing in Python memory
+        ss_cursor = cursor_obj.connection.cursor(pymysql.cursors.SSCursor)
+        try:
+            ss_cursor.execute(f"SELECT * FROM {table_name} LIMIT 50;")
+            # csv.writer formats the batch in C, avoiding a Python
+            # repr+print call per row
+            csv.writer(sys.stdout).writerows(ss_cursor.fetchmany(50))
+        finally:
+            ss_cursor.close()
+
+# Shared connection pool, created lazily on first use
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def _get_pool():
+    """
+    Builds the connection pool once and reuses it for every
+    subsequent run, avoiding a fresh TCP+auth handshake per run.
+    """
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                # no init() here: get_conn() creates connections
+                # lazily up to max_size, while init() would start the
+                # pool's self-rescheduling non-daemon resize timer and
+                # keep the one-shot script alive forever after commit
+                _POOL = Pool(
+                    min_size=5,
+                    max_size=10,
+                    **_CONN_KW
+                )
+                logging.info("Connection pool initialized.")
+    return _POOL
+
+# Log the final failure and fall back to the old None contract
+def _log_connection_failure(retry_state):
+    """
+    Called once the retries are exhausted; keeps the main flow's
+    'if conn:' check working by returning None.
+    """
+    logging.error(
+        f"Connection failed after {retry_state.attempt_number} attempts: "
+        f"{retry_state.outcome.exception()}"
+    )
+    return None
 
 # Connect to the MySQL database
+@retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential_jitter(initial=0.1, max=5),
+    retry=retry_if_exception_type(pymysql.err.OperationalError),
+    retry_error_callback=_log_connection_failure,
+)
 def connect_to_database():
     """
-    Establishes a connection to the database
-    using the custom sql.connection module.
+    Borrows a connection from the shared pool instead of
+    opening a new one for every run. Transient OperationalErrors
+    are retried with exponential backoff and jitter so a blip
+    does not kill the run or hammer a struggling server.
     """
+    conn = _get_pool().get_conn()
     try:
-        conn = pymysql.connect(
-            host='localhost',
-            user='root',
-            password='SpaceX0203',
-            database='Madhan',
-            port=3306
-        )
-        logging.info("Connected to MySQL database.")
-        return conn
-    except Error as err:
-        logging.error(f"Connection error: {err}")
-        return None
+        _tune_session_for_bulk_load(conn)
+    except Exception:
+        # give the connection back before the retry decorator
+        # re-enters, otherwise each attempt leaks one from the pool
+        _get_pool().release(conn)
+        raise
+    logging.info("Connected to MySQL database.")
+    return conn
+
+# Session-level tuning for the bulk load paths
+def _tune_session_for_bulk_load(conn):
+    """
+    Relaxes foreign key checking for this session's bulk
+    INSERT ... SELECT statements; this is safe only because the
+    load copies from already-validated tables. unique_checks is
+    deliberately left on: the control-table seed relies on
+    duplicate-key detection for its ON DUPLICATE KEY UPDATE
+    rerun safety. To also defer the per-commit redo-log fsync,
+    run SET GLOBAL innodb_flush_log_at_trx_commit = 2 out-of-band
+    (the variable is GLOBAL-scope only and needs admin
+    privileges).
+    """
+    tuning_cur = conn.cursor()
+    tuning_cur.execute("SET SESSION foreign_key_checks = 0;")
+    tuning_cur.close()
+    logging.info("Session tuned for bulk load.")
+
+# Return a pooled connection instead of closing it
+def release_connection(conn):
+    """
+    Hands the connection back to the pool so it can be
+    reused by the next run.
+    """
+    _get_pool().release(conn)
+    logging.info("Database connection released back to pool.")
+
+# Log the optimizer's plan for the hot statements once per run
+def explain_hot_statements(cursor_obj):
+    """
+    Emits EXPLAIN output for the delta insert and the target
+    push statements at DEBUG level, so index/plan regressions
+    show up in the logs without profiling a production run.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    for sql in (_SQL_STG_DELTA_INSERT, _SQL_TGT_INSERT_NEW, _SQL_TGT_UPDATE_CHANGED):
+        cursor_obj.execute("EXPLAIN " + sql.strip())
+        logger.debug("EXPLAIN for: %s", " ".join(sql.split())[:80])
+        for row in cursor_obj.fetchall():
+            logger.debug("%s", row)
+
+# One-time DDL to index the CDC hot paths
+def ensure_indexes(cursor_obj):
+    """
+    Creates the indexes used by the incremental load: the date
+    columns driving the delta filter and MAX() lookups, and the
+    control table lookup key. MySQL has no CREATE INDEX IF NOT
+    EXISTS, so duplicate-index errors are ignored on reruns.
+    """
+    index_ddl = [
+        "CREATE INDEX idx_src_dates ON src_jun25 (created_date, modified_date);",
+        "CREATE INDEX idx_stg_dates ON stg_jun25 (created_date DESC, modified_date DESC);",
+        "CREATE UNIQUE INDEX idx_ctl_tbl ON control_table (table_name);",
+    ]
+    for ddl in index_ddl:
+        try:
+            cursor_obj.execute(ddl)
+        except Error as err:
+            # 1061 = ER_DUP_KEYNAME: index already exists from a
+            # previous run; anything else is a real failure
+            if err.args[0] != 1061:
+                raise
+    logging.info("Indexes ensured on source, staging and control tables.")
 
 # Insert data from source to staging
-def insert_data_to_staging(conn):
+def insert_data_to_staging(cursor_obj):
     """
     Loads data from the source table to the staging table.
     """
-    try:
-        cursor_temp = conn.cursor()
-        cursor_temp.execute("truncate table stg_jun25;")
-        logging.info("Staging table truncated successfully.")
-        conn.commit()
-    except Exception as e:
-        logging.error(f"Error truncating staging table: {e}")
-        conn.rollback()
-        return
-    try:
-        cursor_obj = conn.cursor()
-        query_str = """
-            INSERT INTO stg_jun25 (col1_id, col2_desc, col3_desc)
-            SELECT col1_id, col2_desc, col3_desc FROM src_jun25;
-        """
-        cursor_obj.execute(query_str)
-        conn.commit()
-        logging.info("Data inserted into staging table successfully.")
-        print("-------------------------------------------------------------")
-        print("Staging Table: stg_jun25")
-        cursor_obj.execute("SELECT * FROM stg_jun25;")
-        rows = cursor_obj.fetchall()
-        for row in rows:
-            print(row)
-        print("-------------------------------------------------------------")
-    except Exception as e:
-        logging.error(f"Error inserting data into staging: {e}")
-        conn.rollback()
+    cursor_obj.execute(_SQL_TRUNCATE_STG)
+    logging.info("Staging table truncated successfully.")
+    cursor_obj.execute(_SQL_STAGING_INSERT)
+    logging.info("Data inserted into staging table successfully.")
+    preview_table(cursor_obj, "stg_jun25")
 
 # Insert data to control table initially
-def insert_data_to_control(conn):
+def insert_data_to_control(cursor_obj):
     """
     Inserts a new entry into the control table with timestamps.
     """
-    try:
-        cursor_obj = conn.cursor()
-        query_str = """
-            INSERT INTO control_table (table_name, max_created_date, max_modified_date)
-            VALUES ('tgt_jun25', CURRENT_TIMESTAMP(), CURRENT_TIMESTAMP());
-        """
-        cursor_obj.execute(query_str)
-        conn.commit()
-        logging.info("Data inserted into control table successfully.")
-        print("-------------------------------------------------------------")
-        print("Control Table: control_table")
-        cursor_obj.execute("SELECT * FROM control_table;")
-        rows = cursor_obj.fetchall()
-        for row in rows:
-            print(row)
-        print("-------------------------------------------------------------")
-    except Exception as e:
-        logging.error(f"Error inserting data into control table: {e}")
-        conn.rollback()
+    cursor_obj.execute(_SQL_CONTROL_INSERT)
+    logging.info("Data inserted into control table successfully.")
+    preview_table(cursor_obj, "control_table")
 
 # Update control table after staging load
-def update_control_table_stg(conn):
+def update_control_table_stg(cursor_obj):
     """
     Updates the control table's max dates based on the staging data,
     and simulates an update on the source table.
     """
-    try:
-        cursor_obj = conn.cursor()
-        # update control_table with new max values
-        query_str = """
-            UPDATE control_table
-            SET
-                max_created_date = (SELECT MAX(created_date) FROM stg_jun25),
-                max_modified_date = (SELECT MAX(modified_date) FROM stg_jun25)
-            WHERE table_name = 'tgt_jun25';
-        """
-        cursor_obj.execute(query_str)
-        conn.commit()
-        logging.info("Control table updated after staging load.")
-        print("-------------------------------------------------------------")
-        print("Control Table: control_table Updated")
-        cursor_obj.execute("SELECT * FROM control_table;")
-        rows = cursor_obj.fetchall()
-        for row in rows:
-            print(row)
-        print("-------------------------------------------------------------")
-
-        # simulate a source table change
-        query_update = """
-            UPDATE src_jun25
-            SET col2_desc = 'Joshua', col3_desc = 'Pro player'
-            WHERE col1_id = 4;
-        """
-        cursor_obj.execute(query_update)
-        print("-------------------------------------------------------------")
-        print("Source Table: src_jun25 Updated")
-        cursor_obj.execute("SELECT * FROM src_jun25;")
-        rows = cursor_obj.fetchall()
-        for row in rows:
-            print(row)
-        print("-------------------------------------------------------------")
-        conn.commit()
-        logging.info("Source table updated to simulate a change.")
-    except Exception as e:
-        logging.error(f"Error updating control table after staging: {e}")
-        conn.rollback()
+    # update control_table with new max values
+    cursor_obj.execute(_SQL_STG_MAX_DATES)
+    cursor_obj.execute(_SQL_CONTROL_UPDATE_FROM_VARS)
+    logging.info("Control table updated after staging load.")
+    preview_table(cursor_obj, "control_table")
+
+    # simulate a source table change
+    cursor_obj.execute(_SQL_SRC_SIMULATED_UPDATE, ("Joshua", "Pro player", 4))
+    preview_table(cursor_obj, "src_jun25")
+    logging.info("Source table updated to simulate a change.")
 
 # Insert new data into staging after source update
-def insert_into_stg(conn):
+def insert_into_stg(cursor_obj):
     """
     Loads new or changed records from the source to staging
-    based on max dates from the control table.
+    based on max dates from the control table. Skips the insert
+    entirely when nothing is newer than the watermark.
     """
-    try:
-        cursor_obj = conn.cursor()
-        query_str = """
-            INSERT INTO stg_jun25 (col1_id, col2_desc, col3_desc)
-            SELECT s.col1_id, s.col2_desc, s.col3_desc
-            FROM src_jun25 s
-            JOIN control_table c
-              ON c.table_name = 'tgt_jun25'
-            WHERE s.created_date > c.max_created_date
-               OR s.modified_date > c.max_modified_date;
-        """
-        cursor_obj.execute(query_str)
-        conn.commit()
-        logging.info("New or changed data inserted into staging table successfully.")
-        print("-------------------------------------------------------------")
-        print("Staging Table: stg_jun25 Updated")
-        cursor_obj.execute("SELECT * FROM stg_jun25;")
-        rows = cursor_obj.fetchall()
-        for row in rows:
-            print(row)
-        print("-------------------------------------------------------------")
-    except Exception as e:
-        logging.error(f"Error inserting new data into staging: {e}")
-        conn.rollback()
+    cursor_obj.execute(_SQL_DELTA_EXISTS)
+    if not cursor_obj.fetchone()[0]:
+        logging.info("No new or changed source rows; staging delta skipped.")
+        return
+    cursor_obj.execute(_SQL_STG_DELTA_INSERT)
+    logging.info("New or changed data inserted into staging table successfully.")
+    preview_table(cursor_obj, "stg_jun25")
+
+# Cheap check used to skip the downstream steps on quiet runs
+def staging_has_rows(cursor_obj):
+    """
+    Returns True when the staging table holds at least one row.
+    """
+    cursor_obj.execute(_SQL_STG_HAS_ROWS)
+    return bool(cursor_obj.fetchone()[0])
 
 # Push data from staging to target with upsert logic
-def push_to_target_table(conn):
+def push_to_target_table(cursor_obj):
     """
-    Inserts or updates data from staging to target using
-    ON DUPLICATE KEY logic.
+    Inserts new rows and updates changed rows from staging to
+    target as two set-based statements, instead of ON DUPLICATE
+    KEY probing the unique index for every staged row.
     """
-    try:
-        cursor_obj = conn.cursor()
-        query_str = """
-            INSERT INTO tgt_jun25 (col1_id, col2_desc, col3_desc)
-            SELECT col1_id, col2_desc, col3_desc
-            FROM stg_jun25
-            ON DUPLICATE KEY UPDATE
-                col2_desc = VALUES(col2_desc),
-                col3_desc = VALUES(col3_desc);
-        """
-        cursor_obj.execute(query_str)
-        conn.commit()
-        logging.info("Data pushed to target table successfully.")
-        print("-------------------------------------------------------------")
-        print("Target Table: tgt_jun25")
-        cursor_obj.execute("SELECT * FROM tgt_jun25;")
-        rows = cursor_obj.fetchall()
-        for row in rows:
-            print(row)
-        print("-------------------------------------------------------------")
-    except Exception as e:
-        logging.error(f"Error pushing data to target table: {e}")
-        conn.rollback()
+    # new rows: no matching key in target yet
+    cursor_obj.execute(_SQL_TGT_INSERT_NEW)
+    logging.info("New rows inserted into target table.")
+
+    # changed rows: update only when a value actually differs,
+    # so unchanged rows cost no dirty-page writes
+    cursor_obj.execute(_SQL_TGT_UPDATE_CHANGED)
+    logging.info("Changed rows updated in target table.")
+    preview_table(cursor_obj, "tgt_jun25")
 
 # Final update of control table after pushing to target
-def update_control_table_tgt(conn):
+def update_control_table_tgt(cursor_obj):
     """
     Updates the control table based on the target table’s
     new max dates after loading is done.
     """
-    try:
-        cursor_obj = conn.cursor()
-        query_str = """
-            UPDATE control_table
-            SET
-                max_created_date = (SELECT MAX(created_date) FROM tgt_jun25),
-                max_modified_date = (SELECT MAX(modified_date) FROM tgt_jun25)
-            WHERE table_name = 'tgt_jun25';
-        """
-        cursor_obj.execute(query_str)
-        conn.commit()
-        logging.info("Control table updated after target load.")
-    except Exception as e:
-        logging.error(f"Error updating control table after target load: {e}")
-        conn.rollback()
+    cursor_obj.execute(_SQL_TGT_MAX_DATES)
+    cursor_obj.execute(_SQL_CONTROL_UPDATE_FROM_VARS)
+    logging.info("Control table updated after target load.")
 
 
 # -------------------------------------------------------------# 
@@ -240,26 +399,44 @@ if __name__ == "__main__":
     conn = connect_to_database()
     if conn:
         try:
+            # Run all six steps on one cursor inside a single
+            # transaction, so the server fsyncs once per run
+            # instead of once per step.
+            conn.autocommit(False)
+            cursor_obj = conn.cursor()
+
+            # Step 0: Make sure the CDC indexes exist, and log the
+            # query plans for the hot statements when debugging
+            ensure_indexes(cursor_obj)
+            explain_hot_statements(cursor_obj)
+
             # Step 1: Insert data into staging
-            insert_data_to_staging(conn)
+            insert_data_to_staging(cursor_obj)
 
             # Step 2: Insert initial data into control table
-            insert_data_to_control(conn)
+            insert_data_to_control(cursor_obj)
 
             # Step 3: Update control table after staging load
-            update_control_table_stg(conn)
+            update_control_table_stg(cursor_obj)
 
             # Step 4: Insert new data into staging after source update
-            insert_into_stg(conn)
+            insert_into_stg(cursor_obj)
 
-            # Step 5: Push data from staging to target
-            push_to_target_table(conn)
+            if staging_has_rows(cursor_obj):
+                # Step 5: Push data from staging to target
+                push_to_target_table(cursor_obj)
 
-            # Step 6: Final update of control table after target load
-            update_control_table_tgt(conn)
+                # Step 6: Final update of control table after target load
+                update_control_table_tgt(cursor_obj)
+            else:
+                logging.info("Staging is empty; target push and control update skipped.")
 
+            conn.commit()
+            logging.info("Pipeline committed successfully.")
+        except Exception as e:
+            logging.error(f"Pipeline failed, rolling back: {e}")
+            conn.rollback()
         finally:
-            conn.close()
-            logging.info("Database connection closed.")
+            release_connection(conn)
     else:
         logging.error("Failed to connect to the database.")
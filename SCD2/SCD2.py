@@ -32,8 +32,50 @@ to a dimension attribute over time.
 """
 
 import sqlite3
+import itertools
 from datetime import datetime
 
+def bulk_load(cur, tbl, cols, rows, chunk=1000):
+    """
+    Inserts rows into tbl in chunks, each chunk as one
+    multi-VALUES statement, so parse/execute overhead is per
+    chunk rather than per row. Keep chunk * len(cols) under
+    SQLite's bound-variable limit (999 on builds before 3.32,
+    32766 after).
+    """
+    placeholder = "(" + ",".join(["?"] * len(cols)) + ")"
+    collist = ",".join(cols)
+    it = iter(rows)
+    while True:
+        batch = list(itertools.islice(it, chunk))
+        if not batch:
+            break
+        sql = (
+            f"INSERT INTO {tbl} ({collist}) VALUES "
+            + ",".join([placeholder] * len(batch))
+        )
+        cur.execute(sql, [value for row in batch for value in row])
+
+# Shared by Steps 5 and 9: insert staged rows that have no active
+# target record or whose phone number changed. Defined once so both
+# executes hit the same entry in sqlite3's statement cache.
+INSERT_NEW_TARGETS_SQL = """
+    INSERT INTO target (cust_id, phone_no, created_date, modified_date, start_date, end_date)
+    SELECT
+        s.cust_id,
+        s.phone_no,
+        s.created_date,
+        s.modified_date,
+        s.start_date,
+        s.end_date
+    FROM staging s
+    LEFT JOIN target t
+        ON s.cust_id = t.cust_id AND t.end_date IS NULL
+    WHERE
+        t.cust_id IS NULL
+        OR t.phone_no != s.phone_no
+"""
+
 def scd2_demo():
     """
     Function to simulate SCD Type 2 dimension loading
@@ -46,6 +88,12 @@ def scd2_demo():
     conn = sqlite3.connect(":memory:")
     cursor = conn.cursor()
 
+    # Cheap journal settings for the scratch pipeline
+    # (no-ops in-memory, but carry over to file-backed use)
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+
     # -------------------------------------------------------
     # Step 2: Drop and recreate source, target, staging tables
     # -------------------------------------------------------
@@ -78,6 +126,9 @@ def scd2_demo():
             start_date TEXT,
             end_date TEXT DEFAULT NULL
         );
+
+        CREATE INDEX idx_target_active ON target(cust_id) WHERE end_date IS NULL;
+        CREATE INDEX idx_staging_cust ON staging(cust_id);
     """)
     conn.commit()
 
@@ -92,121 +143,86 @@ def scd2_demo():
         (5, 9988776655),
         (6, 666666)
     ]
-    cursor.executemany("""
-        INSERT INTO src (cust_id, phone_no)
-        VALUES (?, ?)
-    """, initial_data)
+    bulk_load(cursor, "src", ["cust_id", "phone_no"], initial_data)
     conn.commit()
 
-    # -------------------------------------------------------
-    # Step 4: Load staging from source
-    # (start_date is set as modified_date, end_date NULL)
-    # -------------------------------------------------------
-    cursor.execute("""
-        INSERT INTO staging (cust_id, phone_no, created_date, modified_date, start_date, end_date)
-        SELECT
-            cust_id,
-            phone_no,
-            created_date,
-            modified_date,
-            modified_date,
-            NULL
-        FROM src
-    """)
-    conn.commit()
-
-    # -------------------------------------------------------
-    # Step 5: Initial insert into target (no matching active records)
-    # -------------------------------------------------------
-    cursor.execute("""
-        INSERT INTO target (cust_id, phone_no, created_date, modified_date, start_date, end_date)
-        SELECT
-            s.cust_id,
-            s.phone_no,
-            s.created_date,
-            s.modified_date,
-            s.start_date,
-            s.end_date
-        FROM staging s
-        LEFT JOIN target t
-            ON s.cust_id = t.cust_id AND t.end_date IS NULL
-        WHERE
-            t.cust_id IS NULL
-            OR t.phone_no != s.phone_no
-    """)
-    conn.commit()
-
-    # -------------------------------------------------------
-    # Step 6: Simulate data change in source (cust_id=2)
-    # -------------------------------------------------------
-    cursor.execute("""
-        UPDATE src
-        SET phone_no = 666
-        WHERE cust_id = 2
-    """)
-    conn.commit()
-
-    # -------------------------------------------------------
-    # Step 7: Reload staging with updated source data
-    # -------------------------------------------------------
-    cursor.execute("DELETE FROM staging")
-    cursor.execute("""
-        INSERT INTO staging (cust_id, phone_no, created_date, modified_date, start_date, end_date)
-        SELECT
-            cust_id,
-            phone_no,
-            created_date,
-            modified_date,
-            modified_date,
-            NULL
-        FROM src
-    """)
-    conn.commit()
-
-    # -------------------------------------------------------
-    # Step 8: Close the current active target records
-    # for customers where phone_no has changed
-    # by setting end_date to staging.modified_date
-    # -------------------------------------------------------
-    cursor.execute("""
-        UPDATE target
-        SET end_date = (
-            SELECT s.modified_date
-            FROM staging s
-            WHERE s.cust_id = target.cust_id
-              AND s.phone_no != target.phone_no
-        )
-        WHERE
-            end_date IS NULL
-            AND EXISTS (
-                SELECT 1
-                FROM staging s
-                WHERE s.cust_id = target.cust_id
-                  AND s.phone_no != target.phone_no
-            )
-    """)
-    conn.commit()
-
-    # -------------------------------------------------------
-    # Step 9: Insert new target records for changed phone_no
-    # -------------------------------------------------------
-    cursor.execute("""
-        INSERT INTO target (cust_id, phone_no, created_date, modified_date, start_date, end_date)
-        SELECT
-            s.cust_id,
-            s.phone_no,
-            s.created_date,
-            s.modified_date,
-            s.start_date,
-            s.end_date
-        FROM staging s
-        LEFT JOIN target t
-            ON s.cust_id = t.cust_id AND t.end_date IS NULL
-        WHERE
-            t.cust_id IS NULL
-            OR t.phone_no != s.phone_no
-    """)
-    conn.commit()
+    # Steps 4-9 run inside one transaction: the context manager
+    # commits once on exit (or rolls everything back on error),
+    # instead of fsyncing the journal after every step.
+    with conn:
+
+        # ---------------------------------------------------
+        # Step 4: Load staging from source
+        # (start_date is set as modified_date, end_date NULL)
+        # ---------------------------------------------------
+        cursor.execute("""
+            INSERT INTO staging (cust_id, phone_no, created_date, modified_date, start_date, end_date)
+            SELECT
+                cust_id,
+                phone_no,
+                created_date,
+                modified_date,
+                modified_date,
+                NULL
+            FROM src
+        """)
+
+        # ---------------------------------------------------
+        # Step 5: Initial insert into target (no matching active records)
+        # ---------------------------------------------------
+        cursor.execute(INSERT_NEW_TARGETS_SQL)
+
+        # ---------------------------------------------------
+        # Step 6: Simulate data change in source (cust_id=2)
+        # (bump modified_date too, with sub-second precision so
+        # the change sorts after the initial-load watermark)
+        # ---------------------------------------------------
+        cursor.execute("""
+            UPDATE src
+            SET phone_no = 666,
+                modified_date = strftime('%Y-%m-%d %H:%M:%f', 'now')
+            WHERE cust_id = 2
+        """)
+
+        # ---------------------------------------------------
+        # Step 7: Reload staging with only the delta — rows
+        # modified after the target's watermark — instead of
+        # re-copying the full source table
+        # ---------------------------------------------------
+        cursor.execute("DELETE FROM staging")
+        cursor.execute("""
+            INSERT INTO staging (cust_id, phone_no, created_date, modified_date, start_date, end_date)
+            SELECT
+                cust_id,
+                phone_no,
+                created_date,
+                modified_date,
+                modified_date,
+                NULL
+            FROM src
+            WHERE modified_date > (SELECT MAX(modified_date) FROM target)
+        """)
+
+        # ---------------------------------------------------
+        # Step 8: Close the current active target records
+        # for customers where phone_no has changed
+        # by setting end_date to staging.modified_date
+        # (single-pass UPDATE ... FROM join instead of a
+        # correlated subquery scanning staging per target row)
+        # ---------------------------------------------------
+        cursor.execute("""
+            UPDATE target AS t
+            SET end_date = s.modified_date
+            FROM staging AS s
+            WHERE t.cust_id = s.cust_id
+              AND t.end_date IS NULL
+              AND t.phone_no != s.phone_no
+        """)
+
+        # ---------------------------------------------------
+        # Step 9: Insert new target records for changed phone_no
+        # ---------------------------------------------------
+        cursor.execute(INSERT_NEW_TARGETS_SQL)
 
     # -------------------------------------------------------
     # Step 10: Show final target dimension